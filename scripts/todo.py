@@ -5,178 +5,657 @@ Usage:
     python3 todo.py <command> [options]
 
 Commands:
-    add      --title TITLE [--desc DESC] [--subtasks S1 S2 ...] [--deliverable D] [--deadline YYYY-MM-DD] [--status STATUS] [--file FILE]
+    add      --title TITLE [--desc DESC] [--subtasks S1 S2 ...] [--deliverable D] [--deadline YYYY-MM-DD] [--status STATUS] [--file FILE] [--show-all]
     list     [--status STATUS] [--file FILE]
-    update   --id ID [--title TITLE] [--desc DESC] [--subtasks S1 S2 ...] [--deliverable D] [--deadline YYYY-MM-DD] [--status STATUS] [--file FILE]
-    delete   --id ID [--file FILE]
+    update   --id ID [--title TITLE] [--desc DESC] [--subtasks S1 S2 ...] [--deliverable D] [--deadline YYYY-MM-DD] [--status STATUS] [--file FILE] [--show-all]
+    delete   --id ID [--file FILE] [--show-all]
+    batch    [--file FILE] [--show-all]    (reads a JSON array of {"op": "add"|"update"|"delete", ...} from stdin)
+    export   [--format json|msgpack] [--file FILE]    (writes all tasks to stdout)
+    import   [--format json|msgpack] [--file FILE]    (merges tasks from stdin by id)
+    compact  [--file FILE]
 
 Status values: pending (default), in_progress, done
 Default file: ./todos.json
+
+Changes are appended to a journal next to the snapshot (todos.json ->
+todos.json.jsonl) and folded back into the snapshot by `compact`, or automatically
+once the journal grows past COMPACT_RATIO times the snapshot size. Each
+compaction also writes a summary file (todos.json.idx) holding only the fields
+shown in the table, which `list` and `delete` read instead of the full snapshot.
+
+JSON is encoded/decoded with orjson when it is installed, falling back to the
+standard library otherwise. A FILE ending in .msgpack is stored as MessagePack
+(requires the msgpack package); the journal is always JSON lines.
 """
 
 import argparse
+import functools
 import json
 import os
+import re
 import sys
-import uuid
-from datetime import datetime, timezone
+import unicodedata
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+COMPACT_RATIO = 4
+JOURNAL_SUFFIX = ".jsonl"
+SUMMARY_SUFFIX = ".idx"
+# Fields print_table needs; list/delete read only these from the summary file.
+SUMMARY_FIELDS = ("id", "title", "subtasks", "deliverable", "deadline", "status")
+
+
+def dumps(obj, pretty=False):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def is_msgpack(path):
+    return path.endswith(".msgpack")
+
+
+def pack(path, obj, pretty=True):
+    if is_msgpack(path):
+        return msgpack.packb(obj, use_bin_type=True)
+    return dumps(obj, pretty=pretty)
+
+
+def unpack(path, data):
+    if is_msgpack(path):
+        return msgpack.unpackb(data, raw=False)
+    return loads(data)
+
+
+def journal_path(path):
+    # Derived from the full name so todos.json and todos.msgpack never share one
+    return path + JOURNAL_SUFFIX
 
 
-def load(path):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+def summary_path(path):
+    # Same encoding as the snapshot at path, so pack/unpack are keyed on path
+    return path + SUMMARY_SUFFIX
+
+
+def snapshot_stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def read_summary(path):
+    # The summary is only trusted if it was written for the current snapshot.
+    try:
+        with open(summary_path(path), "rb") as f:
+            summary = unpack(path, f.read())
+        if summary["snapshot"] == snapshot_stamp(path):
+            return summary["todos"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def read_bytes(path):
+    # A single open() both checks existence and reads; no separate stat.
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        return f.read()
+
+
+def load(path, summary=False):
+    # summary=True may return tasks holding only SUMMARY_FIELDS; such lists
+    # are for display and journaling only and must never be passed to save().
+    todos = read_summary(path) if summary else None
+    if todos is None:
+        data = read_bytes(path)
+        todos = [] if data is None else unpack(path, data)
+    journal = read_bytes(journal_path(path))
+    if journal:
+        todos = replay(todos, journal)
+    # Only three statuses exist; interning lets the status filter compare
+    # by identity and shares one string object across all tasks.
+    for t in todos:
+        if isinstance(t.get("status"), str):
+            t["status"] = sys.intern(t["status"])
+    return todos, build_index(todos)
+
+
+def replay(todos, journal):
+    # Replay the journal on top of the snapshot; every op is idempotent, so a
+    # journal left behind by an interrupted compaction replays harmlessly.
+    by_id = {t["id"]: t for t in todos}
+    for line in journal.splitlines():
+        try:
+            entry = loads(line)
+        except ValueError:
+            continue  # torn write from an interrupted append
+        # A batch is one line, so a torn append drops all of it or none
+        for e in entry["ops"] if entry["op"] == "batch" else (entry,):
+            if e["op"] == "add":
+                by_id[e["task"]["id"]] = e["task"]
+            elif e["op"] == "upd":
+                if e["id"] in by_id:
+                    by_id[e["id"]].update(e["fields"])
+            elif e["op"] == "del":
+                by_id.pop(e["id"], None)
+    return list(by_id.values())
+
+
+def build_index(todos):
+    return {t["id"]: i for i, t in enumerate(todos)}
+
+
+def live(todos):
+    # Deletes leave a None tombstone so positions in the index stay valid.
+    return [t for t in todos if t is not None]
+
+
+def write_atomic(path, data):
+    # Write-then-rename so a crash never leaves a half-written file behind.
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
 
 
 def save(path, todos):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(todos, f, ensure_ascii=False, indent=2)
+    todos = live(todos)
+    write_atomic(path, pack(path, todos))
+    summary = [{k: t[k] for k in SUMMARY_FIELDS if k in t} for t in todos]
+    write_atomic(summary_path(path), pack(path, {"snapshot": snapshot_stamp(path), "todos": summary}, pretty=False))
+    # Only truncate the journal once the new snapshot is durably in place.
+    with open(journal_path(path), "wb"):
+        pass
+
+
+def append(path, entry):
+    line = dumps(entry) + b"\n"
+    with open(journal_path(path), "ab+") as f:
+        # Start on a fresh line if an interrupted append left a torn one, so
+        # replay drops only the torn fragment and not this entry as well.
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+
+
+def maybe_compact(path, todos=None):
+    # Callers holding a summary-only list pass todos=None so the full
+    # snapshot is reloaded before it is rewritten.
+    try:
+        snapshot_size = os.path.getsize(path)
+    except OSError:
+        snapshot_size = 0
+    if os.path.getsize(journal_path(path)) > COMPACT_RATIO * snapshot_size:
+        if todos is None:
+            todos, _ = load(path)
+        save(path, todos)
+
+
+_NOW = None
 
 
 def now_iso():
-    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+    # Second resolution: one timestamp covers the whole invocation, batch included.
+    global _NOW
+    if _NOW is None:
+        # Imported here: list/delete never need a timestamp
+        from datetime import datetime, timezone
 
+        _NOW = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    return _NOW
 
+
+STATUSES = ["pending", "in_progress", "done"]
 STATUS_EMOJI = {"pending": "⏳", "in_progress": "🔄", "done": "✅"}
+STATUS_DISPLAY = {k: f"{v} {k}" for k, v in STATUS_EMOJI.items()}
+
+
+# Combining marks, variation selectors and joiners take no column of their own.
+ZERO_WIDTH_CATEGORIES = ("Mn", "Me", "Cf")
+# Blocks whose assigned characters are all wide (Hangul Jamo, CJK radicals and
+# ideographs, kana, Hangul syllables, fullwidth forms), checked against
+# unicodedata. Text made only of these and ASCII is measured by one C-level
+# regex match instead of a per-character lookup.
+WIDE_BLOCKS = (
+    (0x1100, 0x115F), (0x2E80, 0x2E99), (0x2E9B, 0x2EF3), (0x2F00, 0x2FD5),
+    (0x3000, 0x3029), (0x302E, 0x303E), (0x3041, 0x3096), (0x309B, 0x30FF),
+    (0x3105, 0x312F), (0x3131, 0x318E), (0x3190, 0x31E3), (0x31F0, 0x321E),
+    (0x3220, 0x3247), (0x3250, 0x4DBF), (0x4E00, 0xA48C), (0xA490, 0xA4C6),
+    (0xAC00, 0xD7A3), (0xF900, 0xFAFF), (0xFE30, 0xFE52), (0xFF01, 0xFF60),
+    (0xFFE0, 0xFFE6), (0x20000, 0x2FFFD), (0x30000, 0x3FFFD),
+)
+# Likewise for one-column text: Latin (minus the soft hyphen), IPA, Greek,
+# Cyrillic and general punctuation, without their combining marks.
+NARROW_BLOCKS = (
+    (0x0080, 0x00AC), (0x00AE, 0x02FF), (0x0370, 0x0377), (0x037A, 0x037F),
+    (0x0384, 0x038A), (0x038E, 0x03A1), (0x03A3, 0x0482), (0x048A, 0x052F),
+    (0x2010, 0x2027), (0x2030, 0x205E),
+)
+
+
+def _block_re(blocks):
+    return re.compile("[\x00-\x7f" + "".join(f"{chr(a)}-{chr(b)}" for a, b in blocks) + "]*")
+
+
+ASCII_OR_WIDE_RE = _block_re(WIDE_BLOCKS)
+ASCII_OR_NARROW_RE = _block_re(NARROW_BLOCKS)
+VS16 = "\ufe0f"
+# Per-character widths, filled lazily; summed through map() so lookups stay in C.
+CHAR_WIDTHS = dict.fromkeys(map(chr, range(128)), 1)
+
+
+def char_width(c):
+    if unicodedata.category(c) in ZERO_WIDTH_CATEGORIES:
+        return 0
+    # Wide and fullwidth (CJK, most emoji) occupy two terminal columns
+    return 2 if unicodedata.east_asian_width(c) in ("W", "F") else 1
+
+
+@functools.lru_cache(maxsize=4096)
+def display_width(s):
+    if s.isascii():
+        return len(s)
+    n = len(s)
+    if ASCII_OR_WIDE_RE.fullmatch(s):
+        # CJK text (possibly with ASCII words): every non-ASCII char is wide
+        return 2 * n - len(s.encode("ascii", "ignore"))
+    if ASCII_OR_NARROW_RE.fullmatch(s):
+        return n
+    try:
+        w = sum(map(CHAR_WIDTHS.__getitem__, s))
+    except KeyError:
+        for c in s:
+            if c not in CHAR_WIDTHS:
+                CHAR_WIDTHS[c] = char_width(c)
+        w = sum(map(CHAR_WIDTHS.__getitem__, s))
+    # VS16 asks for emoji presentation, which terminals draw two columns wide
+    # even when the base character (e.g. "❤") is narrow on its own
+    i = s.find(VS16, 1)
+    while i > 0:
+        w += CHAR_WIDTHS[s[i - 1]] == 1
+        i = s.find(VS16, i + 1)
+    return w
 
 
 def print_table(todos, action_msg=None):
-    if action_msg:
-        print(action_msg)
-        print()
+    # Collect every line and hand stdout a single write
+    lines = [action_msg, ""] if action_msg else []
     if not todos:
-        print("（暂无任务）")
+        lines.append("（暂无任务）")
+        sys.stdout.write("\n".join(lines) + "\n")
         return
     # Column headers
     headers = ["ID", "任务", "子任务", "交付物", "DDL", "状态"]
-    # Build rows
+    header_widths = [display_width(h) for h in headers]
+    col_widths = list(header_widths)
+    # Build rows, measuring each cell once and tracking per-column maxima
     rows = []
     for t in todos:
         subtasks = "、".join(t.get("subtasks", [])) if t.get("subtasks") else "-"
         deliverable = t.get("deliverable", "") or "-"
         deadline = t.get("deadline", "") or "-"
         status = t.get("status", "pending")
-        status_display = f"{STATUS_EMOJI.get(status, '')} {status}"
-        rows.append([t["id"][:8], t["title"], subtasks, deliverable, deadline, status_display])
-    # Calculate column widths (accounting for CJK characters)
-    def display_width(s):
-        w = 0
-        for c in s:
-            w += 2 if ord(c) > 127 else 1
-        return w
-
-    col_widths = [max(display_width(headers[i]), *(display_width(r[i]) for r in rows)) for i in range(len(headers))]
-
-    def pad(s, width):
-        return s + " " * (width - display_width(s))
-
-    sep = "| " + " | ".join("-" * w for w in col_widths) + " |"
-    header_line = "| " + " | ".join(pad(h, col_widths[i]) for i, h in enumerate(headers)) + " |"
-    print(header_line)
-    print(sep)
-    for r in rows:
-        print("| " + " | ".join(pad(r[i], col_widths[i]) for i in range(len(headers))) + " |")
-
-
-def cmd_add(args):
-    todos = load(args.file)
+        # A hand-edited file may hold a non-string status; show it rather than crash
+        status_display = STATUS_DISPLAY.get(status, status) if isinstance(status, str) else str(status)
+        row = [t["id"][:8], t["title"], subtasks, deliverable, deadline, status_display]
+        widths = [display_width(cell) for cell in row]
+        for i, w in enumerate(widths):
+            if w > col_widths[i]:
+                col_widths[i] = w
+        rows.append((row, widths))
+
+    def format_row(cells, widths):
+        return "| " + " | ".join(c + " " * (col_widths[i] - widths[i]) for i, c in enumerate(cells)) + " |"
+
+    lines.append(format_row(headers, header_widths))
+    lines.append("| " + " | ".join("-" * w for w in col_widths) + " |")
+    lines.extend(format_row(row, widths) for row, widths in rows)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def _apply_add(todos, index, op):
+    ts = now_iso()
+    # Replay keys tasks by id, so a repeated id would overwrite an existing task
+    task_id = os.urandom(4).hex()
+    while task_id in index:
+        task_id = os.urandom(4).hex()
     task = {
-        "id": uuid.uuid4().hex[:8],
-        "title": args.title,
-        "description": args.desc or "",
-        "subtasks": args.subtasks or [],
-        "deliverable": args.deliverable or "",
-        "deadline": args.deadline or "",
-        "status": args.status,
-        "created_at": now_iso(),
-        "updated_at": now_iso(),
+        "id": task_id,
+        "title": op["title"],
+        "description": op.get("desc") or "",
+        "subtasks": op.get("subtasks") or [],
+        "deliverable": op.get("deliverable") or "",
+        "deadline": op.get("deadline") or "",
+        "status": op.get("status") or "pending",
+        "created_at": ts,
+        "updated_at": ts,
     }
+    index[task["id"]] = len(todos)
     todos.append(task)
-    save(args.file, todos)
-    print_table(todos, f"✅ 已添加任务: {task['title']}")
+    return task
+
+
+def _apply_update(todos, index, op):
+    i = index.get(op["id"])
+    if i is None:
+        return None
+    t = todos[i]
+    requested = {}
+    if op.get("title"):
+        requested["title"] = op["title"]
+    if op.get("desc") is not None:
+        requested["description"] = op["desc"]
+    if op.get("subtasks") is not None:
+        requested["subtasks"] = op["subtasks"]
+    if op.get("deliverable") is not None:
+        requested["deliverable"] = op["deliverable"]
+    if op.get("deadline") is not None:
+        requested["deadline"] = op["deadline"]
+    if op.get("status"):
+        requested["status"] = op["status"]
+    # Only real differences count; an empty result means nothing to write
+    fields = {k: v for k, v in requested.items() if t.get(k) != v}
+    if fields:
+        fields["updated_at"] = now_iso()
+        t.update(fields)
+    return t, fields
+
+
+def _apply_delete(todos, index, op):
+    i = index.pop(op["id"], None)
+    if i is None:
+        return None
+    t = todos[i]
+    todos[i] = None
+    return t
+
+
+def cmd_add(args):
+    # Only --show-all needs the existing tasks; otherwise adding is one append
+    todos, index = load(args.file) if args.show_all else ([], {})
+    task = _apply_add(todos, index, vars(args))
+    append(args.file, {"op": "add", "task": task})
+    maybe_compact(args.file, todos if args.show_all else None)
+    print_table(todos if args.show_all else [task], f"✅ 已添加任务: {task['title']}")
 
 
 def cmd_list(args):
-    todos = load(args.file)
+    todos, _ = load(args.file, summary=True)
     if args.status:
-        todos = [t for t in todos if t["status"] == args.status]
+        status = sys.intern(args.status)
+        todos = [t for t in todos if t["status"] == status]
     msg = f"筛选状态: {args.status}" if args.status else None
     print_table(todos, msg)
 
 
 def cmd_update(args):
-    todos = load(args.file)
-    for t in todos:
-        if t["id"] == args.id:
-            if args.title:
-                t["title"] = args.title
-            if args.desc is not None:
-                t["description"] = args.desc
-            if args.subtasks is not None:
-                t["subtasks"] = args.subtasks
-            if args.deliverable is not None:
-                t["deliverable"] = args.deliverable
-            if args.deadline is not None:
-                t["deadline"] = args.deadline
-            if args.status:
-                t["status"] = args.status
-            t["updated_at"] = now_iso()
-            save(args.file, todos)
-            print_table(todos, f"✅ 已更新任务: {t['title']}")
-            return
-    print(f"❌ 未找到任务 '{args.id}'", file=sys.stderr)
-    sys.exit(1)
+    todos, index = load(args.file)
+    result = _apply_update(todos, index, vars(args))
+    if result is None:
+        print(f"❌ 未找到任务 '{args.id}'", file=sys.stderr)
+        sys.exit(1)
+    t, fields = result
+    if not fields:
+        print_table(todos if args.show_all else [t], f"ℹ️ 任务无变化: {t['title']}")
+        return
+    append(args.file, {"op": "upd", "id": t["id"], "fields": fields})
+    maybe_compact(args.file, todos)
+    print_table(todos if args.show_all else [t], f"✅ 已更新任务: {t['title']}")
 
 
 def cmd_delete(args):
-    todos = load(args.file)
-    original_len = len(todos)
-    todos = [t for t in todos if t["id"] != args.id]
-    if len(todos) == original_len:
+    todos, index = load(args.file, summary=True)
+    t = _apply_delete(todos, index, vars(args))
+    if t is None:
         print(f"❌ 未找到任务 '{args.id}'", file=sys.stderr)
         sys.exit(1)
+    append(args.file, {"op": "del", "id": args.id})
+    maybe_compact(args.file)
+    print_table(live(todos) if args.show_all else [t], f"🗑️ 已删除任务: {args.id}")
+
+
+def _bad_field(obj, str_fields, list_fields=("subtasks",)):
+    # Name of the first field present with the wrong type, or None
+    for k in str_fields:
+        if obj.get(k) is not None and not isinstance(obj[k], str):
+            return k
+    for k in list_fields:
+        v = obj.get(k)
+        if v is not None and not (isinstance(v, list) and all(isinstance(x, str) for x in v)):
+            return k
+    return None
+
+
+def _batch_error(msg, n=None):
+    prefix = "❌ 批量输入无效" if n is None else f"❌ 第 {n} 项操作失败"
+    print(f"{prefix}: {msg}", file=sys.stderr)
+    sys.exit(1)
+
+
+def cmd_batch(args):
+    # One load and one save for the whole batch; nothing is written unless
+    # every operation applies cleanly. The changes are journaled before the
+    # save, so a journal the save leaves behind still matches the snapshot.
+    todos, index = load(args.file)
+    try:
+        ops = loads(sys.stdin.buffer.read())
+    except ValueError as e:
+        _batch_error(f"JSON 解析失败: {e}")
+    if not isinstance(ops, list):
+        _batch_error("输入必须是 JSON 数组")
+    changed = {}
+    entries = []
+    for n, op in enumerate(ops, 1):
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind not in ("add", "update", "delete"):
+            _batch_error(f"未知操作 '{kind}'", n)
+        bad = _bad_field(op, ("id", "title", "desc", "deliverable", "deadline"))
+        if bad:
+            _batch_error(f"字段 {bad} 类型无效", n)
+        if op.get("status") and op["status"] not in STATUSES:
+            _batch_error(f"无效状态 '{op['status']}'", n)
+        if kind == "add":
+            if not op.get("title"):
+                _batch_error("缺少 title", n)
+            task = _apply_add(todos, index, op)
+            changed[task["id"]] = task
+            entries.append({"op": "add", "task": task})
+            continue
+        if not op.get("id"):
+            _batch_error("缺少 id", n)
+        if kind == "update":
+            result = _apply_update(todos, index, op)
+            task = result[0] if result else None
+            if result and result[1]:
+                entries.append({"op": "upd", "id": task["id"], "fields": result[1]})
+        else:
+            task = _apply_delete(todos, index, op)
+            entries.append({"op": "del", "id": op["id"]})
+        if task is None:
+            _batch_error(f"未找到任务 '{op['id']}'", n)
+        changed[task["id"]] = task
+    if entries:
+        append(args.file, {"op": "batch", "ops": entries})
+        save(args.file, todos)
+    shown = live(todos) if args.show_all else list(changed.values())
+    print_table(shown, f"✅ 已批量执行 {len(ops)} 项操作")
+
+
+def cmd_export(args):
+    todos, _ = load(args.file)
+    if args.format == "msgpack":
+        sys.stdout.buffer.write(msgpack.packb(todos, use_bin_type=True))
+    else:
+        sys.stdout.buffer.write(dumps(todos, pretty=True) + b"\n")
+
+
+def cmd_import(args):
+    data = sys.stdin.buffer.read()
+    try:
+        incoming = msgpack.unpackb(data, raw=False) if args.format == "msgpack" else loads(data)
+    except ValueError as e:
+        print(f"❌ 输入解析失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not isinstance(incoming, list) or not all(isinstance(t, dict) for t in incoming):
+        print("❌ 输入必须是任务数组", file=sys.stderr)
+        sys.exit(1)
+    # Reject anything the other commands could not display or update, and give
+    # missing optional fields the same defaults as add
+    ts = now_iso()
+    for n, t in enumerate(incoming, 1):
+        status = t.get("status")
+        if not isinstance(t.get("id"), str) or not t["id"] or not isinstance(t.get("title"), str):
+            msg = "id 和 title 必须是字符串（id 不能为空）"
+        elif status is not None and status not in STATUSES:
+            msg = f"状态 {status!r} 无效"
+        else:
+            bad = _bad_field(t, ("description", "deliverable", "deadline", "created_at", "updated_at"))
+            msg = bad and f"字段 {bad} 类型无效"
+        if not msg:
+            for k, default in (("description", ""), ("deliverable", ""), ("deadline", ""), ("status", "pending"),
+                               ("created_at", ts), ("updated_at", ts)):
+                if t.get(k) is None:
+                    t[k] = default
+            if t.get("subtasks") is None:
+                t["subtasks"] = []
+            # The journal is JSON whatever the storage format, so values only
+            # msgpack can carry (bytes, non-string keys) are refused here
+            try:
+                dumps(t)
+            except TypeError:
+                msg = "包含无法保存为 JSON 的值"
+        if msg:
+            print(f"❌ 第 {n} 个任务无效: {msg}", file=sys.stderr)
+            sys.exit(1)
+    # A repeated id keeps its last copy, as it would when merged one by one
+    incoming = list({t["id"]: t for t in incoming}.values())
+    # Tasks whose id already exists are replaced, the rest are appended
+    todos, index = load(args.file)
+    for t in incoming:
+        i = index.get(t["id"])
+        if i is None:
+            index[t["id"]] = len(todos)
+            todos.append(t)
+        else:
+            todos[i] = t
+    # Journaled first, like batch, so a journal the save leaves behind replays
+    # to the same tasks
+    append(args.file, {"op": "batch", "ops": [{"op": "add", "task": t} for t in incoming]})
     save(args.file, todos)
-    print_table(todos, f"🗑️ 已删除任务: {args.id}")
+    print_table(incoming, f"📥 已导入 {len(incoming)} 个任务")
+
+
+def cmd_compact(args):
+    todos, _ = load(args.file)
+    save(args.file, todos)
+    print(f"🗜️ 已压缩日志: {len(todos)} 个任务写入 {args.file}")
+
+
+def _setup_add(p):
+    p.add_argument("--title", required=True)
+    p.add_argument("--desc", default="")
+    p.add_argument("--subtasks", nargs="*", default=[])
+    p.add_argument("--deliverable", default="")
+    p.add_argument("--deadline", default="")
+    p.add_argument("--status", default="pending", choices=STATUSES)
+    p.add_argument("--file", default="./todos.json")
+    p.add_argument("--show-all", action="store_true")
+
+
+def _setup_list(p):
+    p.add_argument("--status", choices=STATUSES)
+    p.add_argument("--file", default="./todos.json")
+
+
+def _setup_update(p):
+    p.add_argument("--id", required=True)
+    p.add_argument("--title")
+    p.add_argument("--desc")
+    p.add_argument("--subtasks", nargs="*")
+    p.add_argument("--deliverable")
+    p.add_argument("--deadline")
+    p.add_argument("--status", choices=STATUSES)
+    p.add_argument("--file", default="./todos.json")
+    p.add_argument("--show-all", action="store_true")
+
+
+def _setup_delete(p):
+    p.add_argument("--id", required=True)
+    p.add_argument("--file", default="./todos.json")
+    p.add_argument("--show-all", action="store_true")
+
+
+def _setup_batch(p):
+    p.add_argument("--file", default="./todos.json")
+    p.add_argument("--show-all", action="store_true")
+
+
+def _setup_file_only(p):
+    p.add_argument("--file", default="./todos.json")
+
+
+def _setup_transfer(p):
+    p.add_argument("--format", default="json", choices=["json", "msgpack"])
+    p.add_argument("--file", default="./todos.json")
+
+
+COMMANDS = {
+    "add": (_setup_add, cmd_add),
+    "list": (_setup_list, cmd_list),
+    "update": (_setup_update, cmd_update),
+    "delete": (_setup_delete, cmd_delete),
+    "batch": (_setup_batch, cmd_batch),
+    "export": (_setup_transfer, cmd_export),
+    "import": (_setup_transfer, cmd_import),
+    "compact": (_setup_file_only, cmd_compact),
+}
 
 
 def main():
     parser = argparse.ArgumentParser(description="ToDo List Manager")
     sub = parser.add_subparsers(dest="command", required=True)
-
-    # add
-    p_add = sub.add_parser("add")
-    p_add.add_argument("--title", required=True)
-    p_add.add_argument("--desc", default="")
-    p_add.add_argument("--subtasks", nargs="*", default=[])
-    p_add.add_argument("--deliverable", default="")
-    p_add.add_argument("--deadline", default="")
-    p_add.add_argument("--status", default="pending", choices=["pending", "in_progress", "done"])
-    p_add.add_argument("--file", default="./todos.json")
-
-    # list
-    p_list = sub.add_parser("list")
-    p_list.add_argument("--status", choices=["pending", "in_progress", "done"])
-    p_list.add_argument("--file", default="./todos.json")
-
-    # update
-    p_upd = sub.add_parser("update")
-    p_upd.add_argument("--id", required=True)
-    p_upd.add_argument("--title")
-    p_upd.add_argument("--desc")
-    p_upd.add_argument("--subtasks", nargs="*")
-    p_upd.add_argument("--deliverable")
-    p_upd.add_argument("--deadline")
-    p_upd.add_argument("--status", choices=["pending", "in_progress", "done"])
-    p_upd.add_argument("--file", default="./todos.json")
-
-    # delete
-    p_del = sub.add_parser("delete")
-    p_del.add_argument("--id", required=True)
-    p_del.add_argument("--file", default="./todos.json")
+    # Only the requested command's arguments are needed; build every
+    # subparser when it is missing or unknown so help and errors stay complete.
+    cmd = sys.argv[1] if len(sys.argv) > 1 else None
+    for name in [cmd] if cmd in COMMANDS else COMMANDS:
+        COMMANDS[name][0](sub.add_parser(name))
 
     args = parser.parse_args()
-    {"add": cmd_add, "list": cmd_list, "update": cmd_update, "delete": cmd_delete}[args.command](args)
+    if args.file.endswith((JOURNAL_SUFFIX, SUMMARY_SUFFIX)):
+        print(f"❌ 存储文件不能以 {JOURNAL_SUFFIX} 或 {SUMMARY_SUFFIX} 结尾（这些后缀保留给日志和摘要文件）", file=sys.stderr)
+        sys.exit(1)
+    if msgpack is None and (is_msgpack(args.file) or getattr(args, "format", None) == "msgpack"):
+        print("❌ 使用 msgpack 格式需要先安装 msgpack: pip install msgpack", file=sys.stderr)
+        sys.exit(1)
+    COMMANDS[args.command][1](args)
 
 
 if __name__ == "__main__":